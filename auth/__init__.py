@@ -16,6 +16,7 @@ from .decorators import (
     requires_admin,
     requires_manager_or_above,
     check_permission,
+    get_permissions,
     with_user_context
 )
 from .ui import (
@@ -43,6 +44,7 @@ __all__ = [
     "requires_admin",
     "requires_manager_or_above",
     "check_permission",
+    "get_permissions",
     "with_user_context",
     
     # UI components
@@ -1,65 +1,84 @@
 """
 Decorators for authentication and authorization
 """
-import streamlit as st
-from functools import wraps
-from typing import Callable, List, Optional
+from functools import lru_cache, wraps
+from typing import Callable, Dict, FrozenSet, Iterable, Optional
 
 from .handlers import auth_handler
-from .models import UserRole
+from .models import ROLE_BITS, User, UserRole, roles_to_mask
+from .perm_trie import PermissionTrie
+
+
+# Declarative permission spec; dotted permissions inherit roles from their parents
+PERMISSION_SPEC = (
+    ("view_all_data", {UserRole.ADMIN.value, UserRole.MANAGER.value}),
+    ("export_data", {UserRole.ADMIN.value, UserRole.MANAGER.value, UserRole.SALES.value, UserRole.SUPPLY_CHAIN.value}),
+    ("manage_users", {UserRole.ADMIN.value}),
+    ("view_costs", {UserRole.ADMIN.value, UserRole.MANAGER.value, UserRole.SUPPLY_CHAIN.value}),
+    ("edit_settings", {UserRole.ADMIN.value}),
+)
+
+PERMISSION_TRIE = PermissionTrie(PERMISSION_SPEC)
+
+# Role -> permissions, inverted once at import time
+ROLE_PERMS: Dict[str, FrozenSet[str]] = {
+    role.value: frozenset(
+        perm for perm, _ in PERMISSION_SPEC if PERMISSION_TRIE.allows(role.value, perm)
+    )
+    for role in UserRole
+}
+
+_NO_PERMS: FrozenSet[str] = frozenset()
+
+_ADMIN_MASK = ROLE_BITS[UserRole.ADMIN.value]
+_MANAGER_OR_ABOVE_MASK = ROLE_BITS[UserRole.ADMIN.value] | ROLE_BITS[UserRole.MANAGER.value]
 
 
 def requires_auth(func: Callable) -> Callable:
     """Decorator to require authentication for a function or page"""
     @wraps(func)
     def wrapper(*args, **kwargs):
-        if not auth_handler.is_authenticated():
-            st.error("🔒 Authentication required")
-            st.info("Please login to access this page")
-            st.stop()
-        
-        # Refresh session on activity
-        auth_handler.refresh_session()
-        
+        auth_handler.ensure_access()
         return func(*args, **kwargs)
     
     return wrapper
 
 
-def requires_role(allowed_roles: List[str]) -> Callable:
-    """Decorator to require specific roles for a function or page"""
+def _requires_mask(mask: int) -> Callable:
+    """Decorator requiring the current user's role bit to be set in mask"""
     def decorator(func: Callable) -> Callable:
         @wraps(func)
         def wrapper(*args, **kwargs):
-            if not auth_handler.is_authenticated():
-                st.error("🔒 Authentication required")
-                st.info("Please login to access this page")
-                st.stop()
-            
-            user = auth_handler.get_current_user()
-            if not user or not user.has_any_role(allowed_roles):
-                st.error("🚫 Access Denied")
-                st.warning(f"This page requires one of these roles: {', '.join(allowed_roles)}")
-                st.info(f"Your current role: {user.role if user else 'None'}")
-                st.stop()
-            
-            # Refresh session on activity
-            auth_handler.refresh_session()
-            
+            auth_handler.ensure_access(mask=mask)
             return func(*args, **kwargs)
         
         return wrapper
     return decorator
 
 
+def requires_role(allowed_roles: Iterable[str]) -> Callable:
+    """Decorator to require specific roles for a function or page"""
+    return _requires_mask(roles_to_mask(allowed_roles))
+
+
+_require_admin = _requires_mask(_ADMIN_MASK)
+_require_manager_or_above = _requires_mask(_MANAGER_OR_ABOVE_MASK)
+
+
 def requires_admin(func: Callable) -> Callable:
     """Decorator to require admin role"""
-    return requires_role([UserRole.ADMIN.value])(func)
+    return _require_admin(func)
 
 
 def requires_manager_or_above(func: Callable) -> Callable:
     """Decorator to require manager or admin role"""
-    return requires_role([UserRole.ADMIN.value, UserRole.MANAGER.value])(func)
+    return _require_manager_or_above(func)
+
+
+@lru_cache(maxsize=128)
+def _has_perm(role: str, permission: str) -> bool:
+    """Pure (role, permission) lookup; the permission table is immutable at runtime"""
+    return PERMISSION_TRIE.allows(role, permission)
 
 
 def check_permission(permission: str) -> bool:
@@ -68,17 +87,14 @@ def check_permission(permission: str) -> bool:
     if not user:
         return False
     
-    # Define permission mapping
-    permissions = {
-        "view_all_data": [UserRole.ADMIN.value, UserRole.MANAGER.value],
-        "export_data": [UserRole.ADMIN.value, UserRole.MANAGER.value, UserRole.SALES.value, UserRole.SUPPLY_CHAIN.value],
-        "manage_users": [UserRole.ADMIN.value],
-        "view_costs": [UserRole.ADMIN.value, UserRole.MANAGER.value, UserRole.SUPPLY_CHAIN.value],
-        "edit_settings": [UserRole.ADMIN.value],
-    }
-    
-    allowed_roles = permissions.get(permission, [])
-    return user.has_any_role(allowed_roles)
+    return _has_perm(user.role, permission)
+
+
+def get_permissions(user: Optional[User]) -> FrozenSet[str]:
+    """Get all permissions granted to a user in one lookup"""
+    if not user:
+        return _NO_PERMS
+    return ROLE_PERMS.get(user.role, _NO_PERMS)
 
 
 def with_user_context(func: Callable) -> Callable:
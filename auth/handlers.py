@@ -2,19 +2,98 @@
 Authentication handlers for login, logout, and session management
 """
 import hashlib
+import hmac
 import secrets
+import time
 import streamlit as st
-import pandas as pd
-from datetime import datetime, timedelta
-from typing import Optional, Tuple
+from datetime import datetime
+from typing import Deque, Dict, Optional, Tuple
 import logging
+import threading
+import atexit
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from sqlalchemy import text
 
 from config import db_manager, AUTH_CONFIG
-from .models import User, LoginAttempt
+from .models import User, LoginAttempt, mask_to_roles
 
 logger = logging.getLogger(__name__)
 
+# Password hash algorithms stored in users.password_algo (NULL means legacy SHA256)
+PASSWORD_ALGO_SHA256 = "sha256"
+PASSWORD_ALGO_SCRYPT = "scrypt"
+
+# Seconds a fetched user stays in the in-process cache
+USER_CACHE_TTL = 60
+
+# Seconds a successful is_authenticated() check is reused (covers one rerun)
+AUTH_CHECK_MEMO_TTL = 1.0
+
+# Failed login timestamps per username, shared across all Streamlit sessions
+_failed_attempts: Dict[str, Deque[float]] = {}
+_failed_lock = threading.Lock()
+
+# Upper bound on usernames tracked in _failed_attempts
+MAX_TRACKED_USERNAMES = 10000
+
+# Fire-and-forget writes kept off the login critical path
+_background = ThreadPoolExecutor(max_workers=2, thread_name_prefix="auth-bg")
+atexit.register(_background.shutdown, wait=False)
+
+# Recurring statements, parsed once at import time
+_Q_GET_USER = text("""
+    SELECT 
+        id, username, email, role, employee_id,
+        is_active, last_login, created_date
+    FROM users
+    WHERE username = :username
+    AND delete_flag = 0
+""")
+
+_Q_AUTH = text("""
+    SELECT 
+        id, username, email, role, employee_id,
+        is_active, last_login, created_date,
+        password_hash, password_salt, password_algo
+    FROM users
+    WHERE username = :username
+    AND delete_flag = 0
+""")
+
+# Same as _Q_AUTH for databases without the users.password_algo column
+_Q_AUTH_LEGACY = text("""
+    SELECT 
+        id, username, email, role, employee_id,
+        is_active, last_login, created_date,
+        password_hash, password_salt
+    FROM users
+    WHERE username = :username
+    AND delete_flag = 0
+""")
+
+_Q_HAS_PASSWORD_ALGO = text("""
+    SELECT COUNT(*)
+    FROM INFORMATION_SCHEMA.COLUMNS
+    WHERE TABLE_SCHEMA = DATABASE()
+    AND TABLE_NAME = 'users'
+    AND COLUMN_NAME = 'password_algo'
+""")
+
+_Q_UPDATE_LOGIN = text("""
+    UPDATE users 
+    SET last_login = NOW()
+    WHERE username = :username
+""")
+
+_Q_UPGRADE_PASSWORD = text("""
+    UPDATE users
+    SET password_hash = :password_hash,
+        password_salt = :password_salt,
+        password_algo = :password_algo
+    WHERE username = :username
+""")
+
 
 class AuthenticationError(Exception):
     """Custom exception for authentication errors"""
@@ -28,53 +107,111 @@ class AuthHandler:
         self.max_attempts = AUTH_CONFIG.get("max_attempts", 3)
         self.lockout_duration = AUTH_CONFIG.get("lockout_duration", 900)  # 15 minutes
         self.session_timeout = AUTH_CONFIG.get("session_timeout", 3600)  # 1 hour
+        # users table may be shared with systems that only check SHA256
+        self.upgrade_password_hashes = AUTH_CONFIG.get("upgrade_password_hash", False)
+        self._user_cache: Dict[str, Tuple[float, User]] = {}
+        self._has_password_algo: Optional[bool] = None
         
     def hash_password(self, password: str, salt: str = None) -> Tuple[str, str]:
         """Hash password with salt using SHA256 (matching existing database)"""
         if not salt:
             salt = secrets.token_hex(32)
         
-        pwd_hash = hashlib.sha256((password + salt).encode()).hexdigest()
+        buf = b"".join((password.encode("utf-8"), salt.encode("utf-8")))
+        return hashlib.sha256(buf).hexdigest(), salt
+    
+    def hash_password_v2(self, password: str, salt: str = None) -> Tuple[str, str]:
+        """Hash password with salt using scrypt"""
+        if not salt:
+            salt = secrets.token_hex(32)
+        
+        pwd_hash = hashlib.scrypt(
+            password.encode("utf-8"),
+            salt=salt.encode("utf-8"),
+            n=2**14, r=8, p=1, dklen=32
+        ).hex()
         return pwd_hash, salt
     
-    def verify_password(self, password: str, password_hash: str, salt: str) -> bool:
-        """Verify password against hash and salt using SHA256"""
+    def verify_password(self, password: str, password_hash: str, salt: str,
+                        algo: Optional[str] = None) -> bool:
+        """Verify password against hash and salt using the stored algorithm"""
         try:
-            pwd_hash, _ = self.hash_password(password, salt)
-            return pwd_hash == password_hash
+            if algo == PASSWORD_ALGO_SCRYPT:
+                pwd_hash, _ = self.hash_password_v2(password, salt)
+            elif algo is None or algo == PASSWORD_ALGO_SHA256:
+                pwd_hash, _ = self.hash_password(password, salt)
+            else:
+                logger.error(f"Unknown password algorithm: {algo}")
+                return False
+            return hmac.compare_digest(pwd_hash.encode(), password_hash.encode())
         except Exception as e:
             logger.error(f"Password verification error: {str(e)}")
             return False
     
+    def upgrade_password_hash(self, username: str, password: str):
+        """Rehash a legacy SHA256 password with scrypt in the background"""
+        _background.submit(self._do_upgrade_password_hash, username, password)
+    
+    def _do_upgrade_password_hash(self, username: str, password: str):
+        """Write scrypt password hash (runs on the background executor)"""
+        pwd_hash, salt = self.hash_password_v2(password)
+        try:
+            with db_manager.get_connection() as conn:
+                conn.execute(_Q_UPGRADE_PASSWORD, {
+                    "password_hash": pwd_hash,
+                    "password_salt": salt,
+                    "password_algo": PASSWORD_ALGO_SCRYPT,
+                    "username": username
+                })
+                conn.commit()
+            self.invalidate_user(username)
+            logger.info(f"Upgraded password hash for user {username}")
+        except Exception as e:
+            logger.error(f"Error upgrading password hash: {str(e)}")
+    
+    def has_password_algo_column(self) -> bool:
+        """Check (once) whether users.password_algo exists (see migrations/)"""
+        if self._has_password_algo is None:
+            try:
+                self._has_password_algo = bool(db_manager.execute_scalar(_Q_HAS_PASSWORD_ALGO))
+            except Exception as e:
+                logger.error(f"Error checking password_algo column: {str(e)}")
+                return False
+        return self._has_password_algo
+    
+    def invalidate_user(self, username: str):
+        """Drop cached user so the next lookup hits the database"""
+        self._user_cache.pop(username, None)
+    
+    def _row_to_user(self, row) -> User:
+        """Build User from a users row"""
+        # DB-API already returns native int/datetime/None values
+        return User(
+            id=row['id'],
+            username=row['username'],
+            email=row['email'] or '',
+            role=row['role'] or 'viewer',
+            employee_id=row['employee_id'],
+            is_active=bool(row['is_active']) if row['is_active'] is not None else True,
+            last_login=row['last_login'],
+            created_date=row['created_date']
+        )
+    
     def get_user(self, username: str) -> Optional[User]:
-        """Get user from database by username"""
-        query = """
-        SELECT 
-            id, username, email, role, employee_id,
-            is_active, last_login, created_date
-        FROM users
-        WHERE username = :username
-        AND delete_flag = 0
-        """
+        """Get user from database by username (cached for USER_CACHE_TTL seconds)"""
+        now = time.monotonic()
+        hit = self._user_cache.get(username)
+        if hit and now - hit[0] < USER_CACHE_TTL:
+            return hit[1]
         
         try:
-            df = db_manager.execute_query(query, {"username": username})
-            if df.empty:
+            row = db_manager.execute_one(_Q_GET_USER, {"username": username})
+            if row is None:
                 return None
                 
-            row = df.iloc[0]
-            
-            # Handle potential None values and type conversions
-            return User(
-                id=int(row['id']),
-                username=str(row['username']),
-                email=str(row['email']) if row['email'] else '',
-                role=str(row['role']) if row['role'] else 'viewer',
-                employee_id=int(row['employee_id']) if pd.notna(row['employee_id']) else None,
-                is_active=bool(row['is_active']) if pd.notna(row['is_active']) else True,
-                last_login=pd.to_datetime(row['last_login']) if pd.notna(row['last_login']) else None,
-                created_date=pd.to_datetime(row['created_date']) if pd.notna(row['created_date']) else None
-            )
+            user = self._row_to_user(row)
+            self._user_cache[username] = (now, user)
+            return user
         except Exception as e:
             logger.error(f"Error getting user: {str(e)}")
             return None
@@ -85,22 +222,15 @@ class AuthHandler:
         if self.is_account_locked(username):
             raise AuthenticationError("Account is temporarily locked due to multiple failed attempts")
         
-        # Get user credentials
-        query = """
-        SELECT username, password_hash, password_salt, is_active
-        FROM users
-        WHERE username = :username
-        AND delete_flag = 0
-        """
-        
+        # Get user credentials and profile in one round-trip
         try:
-            df = db_manager.execute_query(query, {"username": username})
-            if df.empty:
+            has_algo = self.has_password_algo_column()
+            query = _Q_AUTH if has_algo else _Q_AUTH_LEGACY
+            row = db_manager.execute_one(query, {"username": username})
+            if row is None:
                 self.record_failed_attempt(username)
                 return None
             
-            row = df.iloc[0]
-            
             # Check if user is active
             if not bool(row['is_active']):
                 raise AuthenticationError("Account is deactivated")
@@ -108,17 +238,25 @@ class AuthHandler:
             # Get password hash and salt
             password_hash = str(row['password_hash']) if row['password_hash'] else ''
             password_salt = str(row['password_salt']) if row['password_salt'] else ''
+            password_algo = (row['password_algo'] if has_algo else None) or PASSWORD_ALGO_SHA256
             
             # Verify password
-            if self.verify_password(password, password_hash, password_salt):
+            if self.verify_password(password, password_hash, password_salt, password_algo):
                 # Clear failed attempts
                 self.clear_failed_attempts(username)
                 
+                # Upgrade legacy hashes on successful login (opt-in)
+                if (self.upgrade_password_hashes and has_algo
+                        and password_algo != PASSWORD_ALGO_SCRYPT):
+                    self.upgrade_password_hash(username, password)
+                
                 # Update last login
                 self.update_last_login(username)
                 
-                # Get full user data
-                return self.get_user(username)
+                # Build user from the same row
+                user = self._row_to_user(row)
+                self._user_cache[username] = (time.monotonic(), user)
+                return user
             else:
                 self.record_failed_attempt(username)
                 return None
@@ -131,34 +269,58 @@ class AuthHandler:
     
     def is_account_locked(self, username: str) -> bool:
         """Check if account is locked due to failed attempts"""
-        key = f"failed_attempts_{username}"
-        attempts = st.session_state.get(key, [])
-        
-        if len(attempts) >= self.max_attempts:
-            last_attempt = datetime.fromisoformat(attempts[-1])
-            lockout_end = last_attempt + timedelta(seconds=self.lockout_duration)
+        with _failed_lock:
+            attempts = _failed_attempts.get(username)
+            if attempts is None or len(attempts) < self.max_attempts:
+                return False
             
-            if datetime.now() < lockout_end:
+            if time.monotonic() - attempts[-1] < self.lockout_duration:
                 return True
-            else:
-                # Lockout period expired, clear attempts
-                st.session_state[key] = []
-                
+            
+            # Lockout period expired, clear attempts
+            del _failed_attempts[username]
         return False
     
     def record_failed_attempt(self, username: str):
         """Record failed login attempt"""
-        key = f"failed_attempts_{username}"
-        attempts = st.session_state.get(key, [])
-        attempts.append(datetime.now().isoformat())
-        
-        # Keep only recent attempts
-        cutoff = datetime.now() - timedelta(seconds=self.lockout_duration)
-        attempts = [a for a in attempts if datetime.fromisoformat(a) > cutoff]
+        now = time.monotonic()
+        cutoff = now - self.lockout_duration
         
-        st.session_state[key] = attempts
+        with _failed_lock:
+            # Move to the end so the dict stays ordered by last failure
+            attempts = _failed_attempts.pop(username, None)
+            
+            # Evict usernames whose last failure has expired (oldest first)
+            while _failed_attempts:
+                oldest = next(iter(_failed_attempts))
+                if _failed_attempts[oldest][-1] > cutoff:
+                    break
+                del _failed_attempts[oldest]
+            
+            if attempts is None:
+                attempts = deque(maxlen=max(self.max_attempts, 1))
+                # At the cap, evict the oldest entry that is not locked; locked
+                # entries are never evicted, so flooding the table with throwaway
+                # usernames cannot reset a lockout. If every entry is locked, the
+                # new username is counted for this warning but not tracked.
+                if len(_failed_attempts) >= MAX_TRACKED_USERNAMES:
+                    unlocked = next(
+                        (name for name, q in _failed_attempts.items() if len(q) < self.max_attempts),
+                        None,
+                    )
+                    if unlocked is not None:
+                        del _failed_attempts[unlocked]
+            
+            if len(_failed_attempts) < MAX_TRACKED_USERNAMES:
+                _failed_attempts[username] = attempts
+            
+            # Keep only recent attempts
+            while attempts and attempts[0] <= cutoff:
+                attempts.popleft()
+            attempts.append(now)
+            count = len(attempts)
         
-        remaining = self.max_attempts - len(attempts)
+        remaining = self.max_attempts - count
         if remaining > 0:
             st.warning(f"Invalid credentials. {remaining} attempts remaining.")
         else:
@@ -166,22 +328,20 @@ class AuthHandler:
     
     def clear_failed_attempts(self, username: str):
         """Clear failed login attempts"""
-        key = f"failed_attempts_{username}"
-        if key in st.session_state:
-            del st.session_state[key]
+        with _failed_lock:
+            _failed_attempts.pop(username, None)
     
     def update_last_login(self, username: str):
-        """Update user's last login timestamp"""
-        query = """
-        UPDATE users 
-        SET last_login = NOW()
-        WHERE username = :username
-        """
-        
+        """Update user's last login timestamp in the background"""
+        _background.submit(self._do_update_last_login, username)
+    
+    def _do_update_last_login(self, username: str):
+        """Write last login timestamp (runs on the background executor)"""
         try:
             with db_manager.get_connection() as conn:
-                conn.execute(text(query), {"username": username})
+                conn.execute(_Q_UPDATE_LOGIN, {"username": username})
                 conn.commit()
+            self.invalidate_user(username)
         except Exception as e:
             logger.error(f"Error updating last login: {str(e)}")
     
@@ -191,9 +351,10 @@ class AuthHandler:
             user = self.authenticate(username, password)
             if user:
                 # Store user in session
-                st.session_state['user'] = user.to_dict()
+                st.session_state['user'] = user
                 st.session_state['authenticated'] = True
-                st.session_state['login_time'] = datetime.now().isoformat()
+                st.session_state['login_time'] = time.monotonic()
+                st.session_state['login_at'] = datetime.now()  # wall clock, shown in the user menu
                 
                 logger.info(f"User {username} logged in successfully")
                 return True
@@ -210,41 +371,73 @@ class AuthHandler:
     
     def logout(self):
         """Logout user and clear session"""
-        if 'user' in st.session_state:
-            username = st.session_state['user'].get('username', 'Unknown')
+        user = st.session_state.get('user')
+        if user is not None:
+            username = user.username
+            self.invalidate_user(username)
             logger.info(f"User {username} logged out")
         
         # Clear session
-        keys_to_remove = ['user', 'authenticated', 'login_time']
+        keys_to_remove = ['user', 'authenticated', 'login_time', 'login_at', '_auth_valid_until']
         for key in keys_to_remove:
             if key in st.session_state:
                 del st.session_state[key]
     
     def is_authenticated(self) -> bool:
         """Check if user is authenticated"""
-        if not st.session_state.get('authenticated', False):
+        session = st.session_state
+        if not session.get('authenticated', False):
             return False
         
+        # Reuse a recent positive check, e.g. from earlier in the same rerun
+        now = time.monotonic()
+        if now < session.get('_auth_valid_until', 0.0):
+            return True
+        
         # Check session timeout
-        if 'login_time' in st.session_state:
-            login_time = datetime.fromisoformat(st.session_state['login_time'])
-            if datetime.now() - login_time > timedelta(seconds=self.session_timeout):
+        login_time = session.get('login_time')
+        if login_time is not None:
+            if now - login_time > self.session_timeout:
                 self.logout()
                 st.warning("Session expired. Please login again.")
                 return False
+            session['_auth_valid_until'] = min(now + AUTH_CHECK_MEMO_TTL,
+                                               login_time + self.session_timeout)
         
         return True
     
+    def ensure_access(self, *, mask: Optional[int] = None) -> User:
+        """Authenticate, check role mask and refresh the session in one pass
+        
+        Stops the script with an error message if access is denied.
+        """
+        session = st.session_state
+        user = session.get('user') if self.is_authenticated() else None
+        if user is None:
+            st.error("🔒 Authentication required")
+            st.info("Please login to access this page")
+            st.stop()
+        
+        if mask is not None and not user.role_bit & mask:
+            st.error("🚫 Access Denied")
+            st.warning(f"This page requires one of these roles: {', '.join(mask_to_roles(mask))}")
+            st.info(f"Your current role: {user.role}")
+            st.stop()
+        
+        # Refresh session on activity
+        session['login_time'] = time.monotonic()
+        return user
+    
     def get_current_user(self) -> Optional[User]:
         """Get current logged in user"""
-        if self.is_authenticated() and 'user' in st.session_state:
-            return User.from_dict(st.session_state['user'])
+        if self.is_authenticated():
+            return st.session_state.get('user')
         return None
     
     def refresh_session(self):
         """Refresh session timeout"""
         if self.is_authenticated():
-            st.session_state['login_time'] = datetime.now().isoformat()
+            st.session_state['login_time'] = time.monotonic()
 
 
 # Create singleton instance
@@ -1,9 +1,10 @@
 """
 User model and authentication data structures
 """
-from dataclasses import dataclass
+import sys
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Optional
+from typing import Collection, Iterable, Optional
 from enum import Enum
 
 
@@ -16,7 +17,35 @@ class UserRole(str, Enum):
     VIEWER = "viewer"
 
 
-@dataclass
+# One bit per role so role checks reduce to an integer AND
+ROLE_BITS = {
+    UserRole.ADMIN.value: 1,
+    UserRole.MANAGER.value: 2,
+    UserRole.SALES.value: 4,
+    UserRole.SUPPLY_CHAIN.value: 8,
+    UserRole.VIEWER.value: 16,
+}
+
+
+def roles_to_mask(roles: Iterable[str]) -> int:
+    """Combine role names into a bitmask; unknown roles raise ValueError"""
+    mask = 0
+    for role in roles:
+        if isinstance(role, UserRole):
+            role = role.value
+        try:
+            mask |= ROLE_BITS[role]
+        except KeyError:
+            raise ValueError(f"Unknown role: {role!r}") from None
+    return mask
+
+
+def mask_to_roles(mask: int) -> list[str]:
+    """List role names set in a bitmask"""
+    return [role for role, bit in ROLE_BITS.items() if mask & bit]
+
+
+@dataclass(slots=True)
 class User:
     """User model matching database schema"""
     id: int
@@ -27,6 +56,13 @@ class User:
     is_active: bool = True
     last_login: Optional[datetime] = None
     created_date: Optional[datetime] = None
+    role_bit: int = field(default=0, init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        if isinstance(self.role, UserRole):
+            self.role = self.role.value
+        self.role = sys.intern(self.role or UserRole.VIEWER.value)
+        self.role_bit = ROLE_BITS.get(self.role, 0)
     
     @property
     def is_admin(self) -> bool:
@@ -52,12 +88,12 @@ class User:
         """Check if user has specific role"""
         return self.role == role
     
-    def has_any_role(self, roles: list[str]) -> bool:
-        """Check if user has any of the specified roles"""
+    def has_any_role(self, roles: Collection[str]) -> bool:
+        """Check if user has any of the specified roles (pass a frozenset for O(1) lookup)"""
         return self.role in roles
     
     def to_dict(self) -> dict:
-        """Convert user to dictionary for session storage"""
+        """Convert user to dictionary for export"""
         return {
             "id": self.id,
             "username": self.username,
@@ -72,22 +108,34 @@ class User:
     @classmethod
     def from_dict(cls, data: dict) -> "User":
         """Create user from dictionary"""
-        # Handle last_login conversion
-        if data.get("last_login"):
-            if isinstance(data["last_login"], str):
+        return cls(**cls._fields_from_dict(data))
+    
+    @staticmethod
+    def _fields_from_dict(data: dict) -> dict:
+        """Filter and convert dictionary values to User constructor arguments"""
+        # Handle datetime conversion
+        data = dict(data)
+        for key in ("last_login", "created_date"):
+            value = data.get(key)
+            if isinstance(value, str):
                 try:
-                    data["last_login"] = datetime.fromisoformat(data["last_login"])
+                    data[key] = datetime.fromisoformat(value)
                 except (ValueError, TypeError):
-                    data["last_login"] = None
-            elif not isinstance(data["last_login"], datetime):
-                data["last_login"] = None
+                    data[key] = None
+            elif value is not None and not isinstance(value, datetime):
+                data[key] = None
         
         # Remove any extra keys that aren't in the User class
         valid_fields = {'id', 'username', 'email', 'role', 'employee_id', 
                        'is_active', 'last_login', 'created_date'}
-        filtered_data = {k: v for k, v in data.items() if k in valid_fields}
-        
-        return cls(**filtered_data)
+        return {k: v for k, v in data.items() if k in valid_fields}
+    
+    def __getstate__(self) -> dict:
+        """Pickle as the to_dict payload if session state is ever serialized"""
+        return self.to_dict()
+    
+    def __setstate__(self, state: dict):
+        self.__init__(**self._fields_from_dict(state))
 
 
 @dataclass 
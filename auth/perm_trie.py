@@ -0,0 +1,50 @@
+"""
+Prefix trie for hierarchical (dotted) permissions
+"""
+import sys
+from typing import Any, Dict, FrozenSet, Iterable, Tuple
+
+# Key under which a node stores the roles granted at that level.
+# A non-string sentinel can never collide with a permission segment.
+_ROLES = object()
+
+_NO_ROLES: FrozenSet[str] = frozenset()
+
+PermissionSpec = Iterable[Tuple[str, Iterable[str]]]
+
+
+class PermissionTrie:
+    """Permission lookup keyed by dotted segments, e.g. ``users.manage.create``
+
+    Roles granted at a node are inherited by every permission below it, so a
+    lookup unions the roles of each node visited along the path.
+    """
+
+    def __init__(self, spec: PermissionSpec = ()):
+        self._root: Dict[Any, Any] = {}
+        for permission, roles in spec:
+            self.insert(permission, roles)
+
+    def insert(self, permission: str, roles: Iterable[str]):
+        """Grant roles to a permission (and everything below it)"""
+        node = self._root
+        for segment in permission.split('.'):
+            node = node.setdefault(sys.intern(segment), {})
+        node[_ROLES] = node.get(_ROLES, _NO_ROLES) | frozenset(roles)
+
+    def roles_for(self, permission: str) -> FrozenSet[str]:
+        """Get all roles granted a permission, including inherited ones"""
+        node = self._root
+        roles = _NO_ROLES
+        for segment in permission.split('.'):
+            node = node.get(segment)
+            if node is None:
+                break
+            granted = node.get(_ROLES)
+            if granted:
+                roles = roles | granted
+        return roles
+
+    def allows(self, role: str, permission: str) -> bool:
+        """Check if role is granted permission"""
+        return role in self.roles_for(permission)
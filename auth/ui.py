@@ -60,6 +60,9 @@ def render_user_menu():
         st.markdown(f"**User:** {user.username}")
         st.markdown(f"**Role:** {user.role.replace('_', ' ').title()}")
         st.markdown(f"**Email:** {user.email}")
+        login_at = st.session_state.get('login_at')
+        if login_at:
+            st.markdown(f"**Logged in:** {login_at.strftime('%Y-%m-%d %H:%M')}")
         
         if st.button("🚪 Logout", use_container_width=True):
             auth_handler.logout()
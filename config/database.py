@@ -4,13 +4,15 @@ Database connection and query management for Sales BI Dashboard
 Handles connection pooling, retries, and query execution
 """
 import pandas as pd
-from sqlalchemy import create_engine, pool, text
-from sqlalchemy.engine import Engine
-from urllib.parse import quote_plus
+from sqlalchemy import create_engine, event, exc, pool, text
+from sqlalchemy.engine import Engine, URL
+from sqlalchemy.sql.elements import TextClause
 import logging
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Mapping, Callable, Tuple, Union
 from contextlib import contextmanager
 import time
+import random
+import threading
 from functools import wraps
 import streamlit as st
 
@@ -18,54 +20,100 @@ from .settings import DB_CONFIG
 
 logger = logging.getLogger(__name__)
 
+# Seconds a pooled connection may go without a liveness check on checkout
+PING_INTERVAL = 60
+
+
+def _connection_url(config: Mapping[str, Any]) -> URL:
+    """Create database connection URL"""
+    return URL.create(
+        "mysql+pymysql",
+        username=config["user"],
+        password=str(config["password"]),
+        host=config["host"],
+        port=config["port"],
+        database=config["database"],
+        query={"charset": "utf8mb4"}
+    )
+
+
+# Engines created by _cached_engine, keyed by its arguments, so close() can
+# dispose one without creating it or touching other configs' engines
+_engines: Dict[Tuple, Engine] = {}
+_engine_lock = threading.Lock()
+
+
+@st.cache_resource
+def _cached_engine(url: URL, pool_size: int, max_overflow: int, pool_recycle: int) -> Engine:
+    """Create one SQLAlchemy engine per distinct config, owned by Streamlit"""
+    logger.info("🔌 Creating new database engine...")
+    
+    engine = create_engine(
+        url,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_recycle=pool_recycle,
+        echo=False,  # Set to True for debugging
+        connect_args={"connect_timeout": 10}
+    )
+    
+    @event.listens_for(engine, "checkout")
+    def _ping_stale_connection(dbapi_connection, connection_record, connection_proxy):
+        """Verify connections idle past PING_INTERVAL instead of pinging every checkout"""
+        now = time.monotonic()
+        if now - connection_record.info.get("last_ping", 0.0) < PING_INTERVAL:
+            return
+        
+        try:
+            cursor = dbapi_connection.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+        except Exception:
+            # Pool discards this connection and retries with a fresh one
+            raise exc.DisconnectionError()
+        connection_record.info["last_ping"] = now
+    
+    with _engine_lock:
+        _engines[(url, pool_size, max_overflow, pool_recycle)] = engine
+    
+    logger.info("✅ Database engine created successfully")
+    return engine
+
+
+@st.cache_data(ttl=300)  # Cache for 5 minutes by default
+def _cached_query(config_key: Tuple[Tuple[str, Any], ...], query: str,
+                  params_key: Tuple[Tuple[str, Any], ...]) -> pd.DataFrame:
+    """Execute query with Streamlit caching"""
+    return DatabaseManager(dict(config_key)).execute_query(query, dict(params_key))
+
+
+def _as_text(query: Union[str, TextClause]) -> TextClause:
+    """Wrap raw SQL in text(), passing prebuilt statements through"""
+    return query if isinstance(query, TextClause) else text(query)
+
 
 class DatabaseManager:
     """Manages database connections and queries with pooling and caching"""
     
-    def __init__(self, config: Dict[str, Any] = None):
+    def __init__(self, config: Mapping[str, Any] = None):
         self.config = config or DB_CONFIG
-        self._engine: Optional[Engine] = None
+        self._config_key = tuple(sorted(self.config.items()))
+        self._engine_args = (
+            _connection_url(self.config),
+            self.config.get("pool_size", 5),
+            self.config.get("max_overflow", 10),
+            self.config.get("pool_recycle", 3600),
+        )
         self._connection_retries = 3
         self._retry_delay = 1  # seconds
         
-    def _create_connection_url(self) -> str:
+    def _create_connection_url(self) -> URL:
         """Create database connection URL"""
-        user = self.config["user"]
-        password = quote_plus(str(self.config["password"]))
-        host = self.config["host"]
-        port = self.config["port"]
-        database = self.config["database"]
-        
-        return f"mysql+pymysql://{user}:{password}@{host}:{port}/{database}"
+        return _connection_url(self.config)
     
     def get_engine(self) -> Engine:
-        """Get or create SQLAlchemy engine with connection pooling"""
-        if self._engine is None:
-            logger.info("🔌 Creating new database engine...")
-            
-            connection_url = self._create_connection_url()
-            
-            # Connection pool configuration
-            pool_config = {
-                "pool_size": self.config.get("pool_size", 5),
-                "max_overflow": self.config.get("max_overflow", 10),
-                "pool_recycle": self.config.get("pool_recycle", 3600),
-                "pool_pre_ping": True,  # Verify connections before using
-            }
-            
-            self._engine = create_engine(
-                connection_url,
-                **pool_config,
-                echo=False,  # Set to True for debugging
-                connect_args={
-                    "connect_timeout": 10,
-                    "charset": "utf8mb4"
-                }
-            )
-            
-            logger.info("✅ Database engine created successfully")
-            
-        return self._engine
+        """Get SQLAlchemy engine with connection pooling (created once per process)"""
+        return _cached_engine(*self._engine_args)
     
     @contextmanager
     def get_connection(self):
@@ -83,44 +131,70 @@ class DatabaseManager:
             if connection:
                 connection.close()
     
-    def execute_query(self, query: str, params: Dict[str, Any] = None) -> pd.DataFrame:
-        """Execute query with retry logic and return DataFrame"""
+    def _execute(self, query: Union[str, TextClause], params: Optional[Dict[str, Any]], fetch: Callable) -> Any:
+        """Run fetch(conn, statement, params) with retry logic"""
         last_error = None
         
         for attempt in range(self._connection_retries):
             try:
                 with self.get_connection() as conn:
-                    df = pd.read_sql(
-                        sql=text(query),
-                        con=conn,
-                        params=params or {}
-                    )
-                    return df
+                    return fetch(conn, _as_text(query), params or {})
                     
-            except Exception as e:
+            except exc.DBAPIError as e:
+                # Only dropped connections are worth retrying
+                if not e.connection_invalidated:
+                    raise
+                
                 last_error = e
                 logger.warning(f"Query attempt {attempt + 1} failed: {str(e)}")
                 
                 if attempt < self._connection_retries - 1:
-                    time.sleep(self._retry_delay * (attempt + 1))
+                    # Jittered exponential backoff to avoid synchronized retries
+                    time.sleep(self._retry_delay * 2 ** attempt * random.uniform(0.5, 1.5))
                     
         logger.error(f"❌ Query failed after {self._connection_retries} attempts")
         raise last_error
     
-    @st.cache_data(ttl=300)  # Cache for 5 minutes by default
-    def cached_query(_self, query: str, params: Dict[str, Any] = None, 
+    def execute_query(self, query: Union[str, TextClause], params: Dict[str, Any] = None) -> pd.DataFrame:
+        """Execute query with retry logic and return DataFrame"""
+        return self._execute(
+            query, params,
+            lambda conn, stmt, p: pd.read_sql(sql=stmt, con=conn, params=p)
+        )
+    
+    def execute_scalar(self, query: Union[str, TextClause], params: Dict[str, Any] = None) -> Any:
+        """Execute query and return a single scalar value, or None"""
+        return self._execute(
+            query, params,
+            lambda conn, stmt, p: conn.execute(stmt, p).scalar_one_or_none()
+        )
+    
+    def execute_one(self, query: Union[str, TextClause], params: Dict[str, Any] = None) -> Optional[Mapping[str, Any]]:
+        """Execute query and return the first row as a mapping, or None"""
+        return self._execute(
+            query, params,
+            lambda conn, stmt, p: conn.execute(stmt, p).mappings().first()
+        )
+    
+    def execute_rows(self, query: Union[str, TextClause], params: Dict[str, Any] = None) -> List[Mapping[str, Any]]:
+        """Execute query and return all rows as mappings (no DataFrame)"""
+        return self._execute(
+            query, params,
+            lambda conn, stmt, p: conn.execute(stmt, p).mappings().all()
+        )
+    
+    def cached_query(self, query: str, params: Dict[str, Any] = None, 
                      cache_key: str = None, ttl: int = 300) -> pd.DataFrame:
         """Execute query with Streamlit caching"""
-        return _self.execute_query(query, params)
+        params_key = tuple(sorted(params.items())) if params else ()
+        return _cached_query(self._config_key, query, params_key)
     
     def test_connection(self) -> bool:
         """Test database connection"""
         try:
-            with self.get_connection() as conn:
-                result = conn.execute(text("SELECT 1"))
-                result.fetchone()
-                logger.info("✅ Database connection test successful")
-                return True
+            self.execute_scalar("SELECT 1")
+            logger.info("✅ Database connection test successful")
+            return True
         except Exception as e:
             logger.error(f"❌ Database connection test failed: {str(e)}")
             return False
@@ -165,14 +239,15 @@ class DatabaseManager:
             
         query += " ORDER BY TABLE_NAME"
         
-        df = self.execute_query(query, params)
-        return df['TABLE_NAME'].tolist()
+        return [row['TABLE_NAME'] for row in self.execute_rows(query, params)]
     
     def close(self):
-        """Close database engine and cleanup connections"""
-        if self._engine:
-            self._engine.dispose()
-            self._engine = None
+        """Close pooled connections; the cached engine reconnects on next use"""
+        with _engine_lock:
+            engine = _engines.get(self._engine_args)
+        
+        if engine is not None:
+            engine.dispose()
             logger.info("Database engine closed")
 
 
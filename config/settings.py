@@ -3,29 +3,117 @@ Main configuration module for Sales BI Dashboard
 Handles environment detection and configuration loading
 """
 import os
-import json
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Mapping, Optional
 from pathlib import Path
+from types import MappingProxyType
+from functools import cached_property
 from dotenv import load_dotenv
 
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+try:
+    from orjson import loads as _json_loads
+except ImportError:  # stdlib json also accepts bytes
+    from json import loads as _json_loads
+
+# Setup logging, unless the host app (e.g. Streamlit) already configured it
+if not logging.root.handlers:
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
 logger = logging.getLogger(__name__)
 
 
+def _safe_int(value: Optional[str], default: int) -> int:
+    """Convert string to int, handling comments and errors"""
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    
+    # Slow path: remove inline comments and retry
+    stripped = value.split('#')[0].strip()
+    try:
+        return int(stripped)
+    except ValueError:
+        logger.warning(f"Invalid integer value: {stripped}, using default: {default}")
+        return default
+
+
+def _has_streamlit_secrets() -> bool:
+    """Cheap check for a possible secrets source, without importing streamlit"""
+    return bool(
+        os.environ.get("STREAMLIT_SHARING_MODE")
+        or os.path.exists("/mount/src")
+        or os.path.exists(".streamlit/secrets.toml")
+        or os.path.exists(os.path.expanduser("~/.streamlit/secrets.toml"))
+    )
+
+
+# Sentinel for missing keys in Config.get
+_MISSING = object()
+
+# Local GCP credentials file, checked once at import
+_CREDS_PATH = Path("credentials.json")
+_CREDS_EXISTS = _CREDS_PATH.is_file()
+
+# Set once .env has been parsed; it is never re-read within a process
+_DOTENV_LOADED = False
+
+# Local (.env) configuration: (dotted key, environment variable, type, default)
+_LOCAL_SCHEMA = (
+    ("database.host", "DB_HOST", str, "erp-all-production.cx1uaj6vj8s5.ap-southeast-1.rds.amazonaws.com"),
+    ("database.port", "DB_PORT", int, 3306),
+    ("database.user", "DB_USER", str, "streamlit_user"),
+    ("database.password", "DB_PASSWORD", str, ""),
+    ("database.database", "DB_NAME", str, "prostechvn"),
+    ("database.pool_size", "DB_POOL_SIZE", int, 5),
+    ("database.pool_recycle", "DB_POOL_RECYCLE", int, 3600),
+    ("api.exchange_rate_key", "EXCHANGE_RATE_API_KEY", str, ""),
+    ("auth.session_timeout", "SESSION_TIMEOUT", int, 3600),
+    ("auth.max_attempts", "MAX_LOGIN_ATTEMPTS", int, 3),
+    ("auth.lockout_duration", "LOCKOUT_DURATION", int, 900),
+    ("auth.upgrade_password_hash", "UPGRADE_PASSWORD_HASH", bool, False),
+    ("app.name", "APP_NAME", str, "Sales BI Dashboard"),
+    ("app.version", "APP_VERSION", str, "1.0.0"),
+    ("app.debug", "DEBUG", bool, False),
+    ("app.timezone", "TIMEZONE", str, "Asia/Ho_Chi_Minh"),
+    ("app.cache_ttl", "CACHE_TTL", int, 300),
+)
+
+
 class Config:
-    """Configuration management for Sales BI Dashboard"""
+    """Configuration management for Sales BI Dashboard (process-wide singleton)"""
+    
+    # Detection result shared by all instances (probing st.secrets parses TOML)
+    _cloud_detected: Optional[bool] = None
+    _instance: Optional["Config"] = None
+    
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
     
     def __init__(self):
+        # __init__ runs on every Config() call; only load once
+        if getattr(self, "_initialized", False):
+            return
         self.is_cloud = self._detect_streamlit_cloud()
         self.config = self._load_config()
+        self._flat = self._flatten(self.config)
+        self._initialized = True
         
     def _detect_streamlit_cloud(self) -> bool:
-        """Detect if running on Streamlit Cloud"""
+        """Detect if running on Streamlit Cloud (probed once per process)"""
+        if Config._cloud_detected is None:
+            Config._cloud_detected = _has_streamlit_secrets() and self._probe_streamlit_secrets()
+        return Config._cloud_detected
+    
+    @staticmethod
+    def _probe_streamlit_secrets() -> bool:
+        """Check st.secrets for DB_CONFIG (imports streamlit)"""
         try:
             import streamlit as st
             return hasattr(st, 'secrets') and "DB_CONFIG" in st.secrets
@@ -45,78 +133,78 @@ class Config:
         
         logger.info("☁️ Loading Streamlit Cloud configuration")
         
+        # Sections are only read from, so keep references instead of copies
+        secrets = st.secrets
         return {
-            "database": dict(st.secrets["DB_CONFIG"]),
+            "database": secrets["DB_CONFIG"],
             "api": {
-                "exchange_rate_key": st.secrets.get("API", {}).get("EXCHANGE_RATE_API_KEY", ""),
+                "exchange_rate_key": secrets.get("API", {}).get("EXCHANGE_RATE_API_KEY", ""),
             },
-            "auth": dict(st.secrets.get("AUTH_CONFIG", {})),
-            "app": dict(st.secrets.get("APP_CONFIG", {})),
-            "gcp": dict(st.secrets.get("gcp_service_account", {}))
+            "auth": secrets.get("AUTH_CONFIG", {}),
+            "app": secrets.get("APP_CONFIG", {}),
         }
     
     def _load_local_config(self) -> Dict[str, Any]:
         """Load configuration from .env file"""
-        load_dotenv()
+        global _DOTENV_LOADED
+        if not _DOTENV_LOADED:
+            load_dotenv()
+            _DOTENV_LOADED = True
         
         logger.info("💻 Loading local configuration")
         
-        # Helper function to safely convert to int
-        def safe_int(value: str, default: int) -> int:
-            """Convert string to int, handling comments and errors"""
-            if value:
-                # Remove inline comments
-                value = value.split('#')[0].strip()
-                try:
-                    return int(value)
-                except ValueError:
-                    logger.warning(f"Invalid integer value: {value}, using default: {default}")
-            return default
+        env = os.environ
+        config: Dict[str, Dict[str, Any]] = {}
         
-        # Load GCP credentials if exists
-        gcp_creds = {}
-        creds_path = Path("credentials.json")
-        if creds_path.exists():
-            with open(creds_path) as f:
-                gcp_creds = json.load(f)
+        # Single pass over the schema against one environment snapshot
+        for key, env_var, kind, default in _LOCAL_SCHEMA:
+            section, _, name = key.partition('.')
+            value = env.get(env_var)
+            
+            if kind is int:
+                value = _safe_int(value, default)
+            elif kind is bool:
+                value = (value if value is not None else str(default)).lower() == "true"
+            elif value is None:
+                value = default
+            
+            config.setdefault(section, {})[name] = value
         
-        return {
-            "database": {
-                "host": os.getenv("DB_HOST", "erp-all-production.cx1uaj6vj8s5.ap-southeast-1.rds.amazonaws.com"),
-                "port": safe_int(os.getenv("DB_PORT"), 3306),
-                "user": os.getenv("DB_USER", "streamlit_user"),
-                "password": os.getenv("DB_PASSWORD", ""),
-                "database": os.getenv("DB_NAME", "prostechvn"),
-                "pool_size": safe_int(os.getenv("DB_POOL_SIZE"), 5),
-                "pool_recycle": safe_int(os.getenv("DB_POOL_RECYCLE"), 3600),
-            },
-            "api": {
-                "exchange_rate_key": os.getenv("EXCHANGE_RATE_API_KEY", ""),
-            },
-            "auth": {
-                "session_timeout": safe_int(os.getenv("SESSION_TIMEOUT"), 3600),
-                "max_attempts": safe_int(os.getenv("MAX_LOGIN_ATTEMPTS"), 3),
-                "lockout_duration": safe_int(os.getenv("LOCKOUT_DURATION"), 900),
-            },
-            "app": {
-                "name": os.getenv("APP_NAME", "Sales BI Dashboard"),
-                "version": os.getenv("APP_VERSION", "1.0.0"),
-                "debug": os.getenv("DEBUG", "False").lower() == "true",
-                "timezone": os.getenv("TIMEZONE", "Asia/Ho_Chi_Minh"),
-                "cache_ttl": safe_int(os.getenv("CACHE_TTL"), 300),
-            },
-            "gcp": gcp_creds
-        }
+        return config
+    
+    @cached_property
+    def gcp(self) -> Dict[str, Any]:
+        """GCP service account credentials, loaded on first access"""
+        if self.is_cloud:
+            import streamlit as st
+            return st.secrets.get("gcp_service_account", {})
+        
+        if _CREDS_EXISTS:
+            return _json_loads(_CREDS_PATH.read_bytes())
+        return {}
+    
+    @staticmethod
+    def _flatten(config: Mapping[str, Any], prefix: str = "") -> Dict[str, Any]:
+        """Flatten nested config into dotted keys (sections are kept as well)"""
+        flat: Dict[str, Any] = {}
+        for k, value in config.items():
+            key = f"{prefix}{k}"
+            flat[key] = value
+            if isinstance(value, Mapping):
+                flat.update(Config._flatten(value, f"{key}."))
+        return flat
     
     def get(self, key: str, default: Any = None) -> Any:
         """Get configuration value by dot notation key"""
-        keys = key.split('.')
-        value = self.config
+        if key != "gcp" and not key.startswith("gcp."):
+            return self._flat.get(key, default)
+        
+        # GCP credentials are loaded lazily, so walk them on demand
+        value = {"gcp": self.gcp}
         
-        for k in keys:
-            if isinstance(value, dict) and k in value:
-                value = value[k]
-            else:
+        for k in key.split('.'):
+            value = value.get(k, _MISSING) if isinstance(value, Mapping) else _MISSING
+            if value is _MISSING:
                 return default
         
         return value
@@ -141,9 +229,9 @@ class Config:
 # Create singleton instance
 config = Config()
 
-# Export commonly used values
-DB_CONFIG = config.get_db_config()
-AUTH_CONFIG = config.get_auth_config()
-APP_CONFIG = config.get_app_config()
+# Export commonly used values (read-only views, no need to copy)
+DB_CONFIG = MappingProxyType(config.get_db_config())
+AUTH_CONFIG = MappingProxyType(config.get_auth_config())
+APP_CONFIG = MappingProxyType(config.get_app_config())
 IS_DEBUG = config.get("app.debug", False)
 TIMEZONE = config.get("app.timezone", "Asia/Ho_Chi_Minh")
\ No newline at end of file
@@ -2,14 +2,49 @@
 Demo app showing authentication in action
 Run: streamlit run demo_auth.py
 """
+import sys
 import streamlit as st
 from auth import (
     protect_page, 
     get_current_user, 
     requires_role, 
     UserRole,
-    check_permission
+    get_permissions
 )
+from config import IS_DEBUG
+
+# Permissions listed in the debug sidebar
+PERMISSIONS = tuple(sys.intern(p) for p in (
+    "view_all_data",
+    "export_data", 
+    "manage_users",
+    "view_costs",
+    "edit_settings"
+))
+
+# Feature grid: (title, required permission, button label, message, denied message)
+FEATURES = (
+    ("👁️ View Sales Data", None, "Open Sales Dashboard",
+     "Sales dashboard would open here...", None),
+    ("📈 View Analytics", "view_all_data", "Open Analytics",
+     "Analytics dashboard would open here...", "You need Manager or Admin role"),
+    ("⚙️ Admin Panel", "manage_users", "Open Admin Panel",
+     "Admin panel would open here...", "Admin access only"),
+)
+
+
+@st.cache_data
+def _demo_sales_df():
+    """Demo data, built once and reused across reruns and sessions"""
+    # Imported here so viewers never pay for pandas/numpy
+    import pandas as pd
+    import numpy as np
+    
+    return pd.DataFrame({
+        'Month': ['Jan', 'Feb', 'Mar', 'Apr', 'May'],
+        'Sales': np.random.randint(100000, 500000, 5),
+        'Orders': np.random.randint(100, 500, 5)
+    })
 
 # Set page config
 st.set_page_config(
@@ -29,6 +64,8 @@ if not user:
     st.error("Authentication error. Please refresh the page.")
     st.stop()
 
+granted = get_permissions(user)
+
 # Main content
 st.title("🎯 Sales BI Dashboard")
 st.markdown(f"Welcome, **{user.username}**! You are logged in as **{user.role}**.")
@@ -37,28 +74,14 @@ st.markdown(f"Welcome, **{user.username}**! You are logged in as **{user.role}**
 st.markdown("---")
 st.markdown("## 📊 Available Features")
 
-col1, col2, col3 = st.columns(3)
-
-with col1:
-    st.markdown("### 👁️ View Sales Data")
-    if st.button("Open Sales Dashboard", use_container_width=True):
-        st.info("Sales dashboard would open here...")
-
-with col2:
-    st.markdown("### 📈 View Analytics")
-    if check_permission("view_all_data"):
-        if st.button("Open Analytics", use_container_width=True):
-            st.info("Analytics dashboard would open here...")
-    else:
-        st.warning("You need Manager or Admin role")
-
-with col3:
-    st.markdown("### ⚙️ Admin Panel")
-    if user.is_admin:
-        if st.button("Open Admin Panel", use_container_width=True):
-            st.info("Admin panel would open here...")
-    else:
-        st.warning("Admin access only")
+for col, (title, permission, button, message, denied) in zip(st.columns(len(FEATURES)), FEATURES):
+    with col:
+        st.markdown(f"### {title}")
+        if permission is None or permission in granted:
+            if st.button(button, use_container_width=True):
+                st.info(message)
+        else:
+            st.warning(denied)
 
 # Role-based content examples
 st.markdown("---")
@@ -69,19 +92,12 @@ st.markdown("### Public Dashboard")
 st.success("✅ This content is visible to all logged-in users")
 
 # Example 2: Manager and above only
-if check_permission("view_all_data"):
+if "view_all_data" in granted:
     st.markdown("### Manager Dashboard")
     st.info("📊 This section is only visible to Managers and Admins")
     
     # Demo data
-    import pandas as pd
-    import numpy as np
-    
-    df = pd.DataFrame({
-        'Month': ['Jan', 'Feb', 'Mar', 'Apr', 'May'],
-        'Sales': np.random.randint(100000, 500000, 5),
-        'Orders': np.random.randint(100, 500, 5)
-    })
+    df = _demo_sales_df()
     
     col1, col2 = st.columns(2)
     with col1:
@@ -108,7 +124,7 @@ if user.is_admin:
 st.markdown("---")
 st.markdown("## 📥 Export Data")
 
-if check_permission("export_data"):
+if "export_data" in granted:
     col1, col2, col3 = st.columns(3)
     with col1:
         st.button("Export to Excel", use_container_width=True)
@@ -119,23 +135,16 @@ if check_permission("export_data"):
 else:
     st.info("💡 Export feature is not available for Viewer role")
 
-# Show session info in sidebar
-with st.sidebar:
-    st.markdown("---")
-    st.markdown("### 🔍 Debug Info")
-    st.markdown(f"**Session State Keys:** {len(st.session_state)}")
-    
-    with st.expander("Permissions"):
-        permissions = [
-            "view_all_data",
-            "export_data", 
-            "manage_users",
-            "view_costs",
-            "edit_settings"
-        ]
+# Show session info in sidebar (debug mode, admins only)
+if IS_DEBUG and user.is_admin:
+    with st.sidebar:
+        st.markdown("---")
+        st.markdown("### 🔍 Debug Info")
+        st.markdown(f"**Session State Keys:** {len(st.session_state)}")
         
-        for perm in permissions:
-            if check_permission(perm):
-                st.success(f"✅ {perm}")
-            else:
-                st.error(f"❌ {perm}")
\ No newline at end of file
+        with st.expander("Permissions"):
+            for perm in PERMISSIONS:
+                if perm in granted:
+                    st.success(f"✅ {perm}")
+                else:
+                    st.error(f"❌ {perm}")
\ No newline at end of file
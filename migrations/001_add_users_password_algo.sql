@@ -0,0 +1,6 @@
+-- Tag each stored password hash with its algorithm.
+-- NULL means the legacy SHA256(password + salt) hash.
+-- Login works without this column; it is required before setting
+-- UPGRADE_PASSWORD_HASH=true (auth.upgrade_password_hash) to rehash with scrypt.
+ALTER TABLE users
+    ADD COLUMN password_algo VARCHAR(16) NULL DEFAULT NULL;